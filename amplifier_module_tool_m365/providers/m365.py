@@ -1,21 +1,18 @@
 """Microsoft 365 / Microsoft Graph collaboration provider."""
 
+import asyncio
+import math
 import os
-from dataclasses import dataclass
+import time
+from collections.abc import AsyncIterator, Mapping
+from dataclasses import dataclass, replace
+from typing import Any, Hashable
+from urllib.parse import quote
 
 import httpx
+import orjson
 from azure.identity import ClientSecretCredential
 from msgraph import GraphServiceClient
-from msgraph.generated.groups.groups_request_builder import GroupsRequestBuilder
-from msgraph.generated.models.body_type import BodyType
-from msgraph.generated.models.email_address import EmailAddress
-from msgraph.generated.models.item_body import ItemBody
-from msgraph.generated.models.message import Message as OutlookMessage
-from msgraph.generated.models.recipient import Recipient
-from msgraph.generated.users.item.send_mail.send_mail_post_request_body import (
-    SendMailPostRequestBody,
-)
-from msgraph.generated.users.users_request_builder import UsersRequestBuilder
 
 from amplifier_module_tool_collab_core import (
     Channel,
@@ -26,6 +23,140 @@ from amplifier_module_tool_collab_core import (
     User,
 )
 
+GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
+GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+GRAPH_BATCH_LIMIT = 20  # Max sub-requests per JSON $batch call
+TOKEN_EXPIRY_MARGIN = 300  # Seconds before expiry at which a token is renewed
+TOKEN_RETRY_DELAY = 30  # Seconds between background refresh attempts on failure
+SIMPLE_UPLOAD_LIMIT = 4 * 1024 * 1024  # Largest file Graph accepts in one PUT
+UPLOAD_CHUNK_SIZE = 10 * 1024 * 1024  # Must be a multiple of 320 KiB
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+MAX_CONCURRENT_REQUESTS = 64  # Matches the shared client's connection limit
+CACHE_TTL = 3600  # Seconds to cache slow-changing users/channels/sites
+RETRY_STATUSES = frozenset({429, 503})  # Graph throttling / busy responses
+MAX_RETRIES = 3
+MAX_RETRY_DELAY = 60.0  # Upper bound on any single Retry-After wait
+MESSAGES_PAGE_LIMIT = 50  # Max $top Graph accepts for channel messages
+USER_FILTER_LIMIT = 15  # Max values Graph accepts in an "id in (...)" filter
+MAIL_RECIPIENT_CHUNK = 50  # Recipients per sendMail request
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# $select field lists covering what the collab-core dataclasses use
+USER_SELECT = "id,displayName,userPrincipalName,mail,department"
+CHANNEL_SELECT = "id,displayName,description"
+DRIVE_ITEM_SELECT = "id,name,webUrl,size,folder"
+
+TEAM_GROUPS_FILTER = "resourceProvisioningOptions/Any(x:x eq 'Team')"
+MAX_CHANNEL_TEAMS = 5  # Teams scanned when listing channels across the tenant
+
+
+def _retry_delay(headers: Mapping[str, str], attempt: int) -> float:
+    """Seconds to wait before a retry, preferring the server's Retry-After.
+
+    The result is clamped to [0, MAX_RETRY_DELAY].
+    """
+    try:
+        delay = float(headers["Retry-After"])
+    except (KeyError, ValueError):
+        delay = float(2**attempt)
+    if math.isnan(delay):
+        delay = float(2**attempt)
+    return min(max(delay, 0.0), MAX_RETRY_DELAY)
+
+
+def _content_range(offset: int, length: int, total: int) -> str:
+    """Content-Range header value for one upload session slice."""
+    return f"bytes {offset}-{offset + length - 1}/{total}"
+
+
+async def _slice_bytes(data: bytes, size: int) -> AsyncIterator[bytes]:
+    """Yield ``size``-byte slices of data without copying it as a whole."""
+    view = memoryview(data)
+    for start in range(0, len(view), size):
+        yield bytes(view[start : start + size])
+
+
+async def _rechunk(chunks: AsyncIterator[bytes], size: int) -> AsyncIterator[bytes]:
+    """Regroup a byte stream into ``size``-byte slices; the last may be shorter."""
+    buffer = bytearray()
+    async for piece in chunks:
+        buffer += piece
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """HTTP transport that retries throttled requests.
+
+    429 and 503 responses are retried up to ``max_retries`` times, waiting
+    for the Retry-After header when present and backing off exponentially
+    otherwise. Each wait is capped at MAX_RETRY_DELAY.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        max_retries: int = MAX_RETRIES,
+    ):
+        self._transport = transport
+        self._max_retries = max_retries
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        for attempt in range(self._max_retries):
+            response = await self._transport.handle_async_request(request)
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            delay = _retry_delay(response.headers, attempt)
+            await response.aclose()
+            await asyncio.sleep(delay)
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class TTLCache:
+    """Small in-memory cache with a fixed time-to-live per entry.
+
+    Keys are tuples whose first element names the entity type
+    (e.g. ``("users", "list", 25)``) so entries can be invalidated per entity.
+    Expired entries are swept at most once per TTL, on write.
+    """
+
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+        self._entries: dict[tuple[Hashable, ...], tuple[float, Any]] = {}
+        self._next_sweep = time.monotonic() + ttl
+
+    def get(self, key: tuple[Hashable, ...]) -> Any | None:
+        """Return the cached value, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expiry, value = entry
+        if time.monotonic() >= expiry:
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key: tuple[Hashable, ...], value: Any) -> None:
+        """Store a value until the TTL elapses."""
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            self._next_sweep = now + self._ttl
+        self._entries[key] = (now + self._ttl, value)
+
+    def invalidate(self, entity: str | None = None) -> None:
+        """Drop all entries for an entity type, or everything if None."""
+        if entity is None:
+            self._entries.clear()
+        else:
+            self._entries = {k: v for k, v in self._entries.items() if k[0] != entity}
+
 
 @dataclass
 class M365Config:
@@ -45,13 +176,13 @@ class M365Config:
 
         if not tenant_id or not client_id or not client_secret:
             missing = [
-                k
-                for k, v in {
-                    "M365_TENANT_ID": tenant_id,
-                    "M365_CLIENT_ID": client_id,
-                    "M365_CLIENT_SECRET": client_secret,
-                }.items()
-                if not v
+                name
+                for name, value in (
+                    ("M365_TENANT_ID", tenant_id),
+                    ("M365_CLIENT_ID", client_id),
+                    ("M365_CLIENT_SECRET", client_secret),
+                )
+                if not value
             ]
             raise ValueError(
                 f"Missing required environment variables: {', '.join(missing)}"
@@ -59,12 +190,10 @@ class M365Config:
 
         # Parse webhooks: "general=url1,alerts=url2,handoffs=url3"
         webhooks: dict[str, str] = {}
-        webhook_str = os.environ.get("M365_TEAMS_WEBHOOKS", "")
-        if webhook_str:
-            for pair in webhook_str.split(","):
-                if "=" in pair:
-                    name, url = pair.split("=", 1)
-                    webhooks[name.strip()] = url.strip()
+        for pair in os.environ.get("M365_TEAMS_WEBHOOKS", "").split(","):
+            name, _, url = (part.strip() for part in pair.partition("="))
+            if name and url:
+                webhooks[name] = url
 
         return cls(
             tenant_id=tenant_id,
@@ -75,7 +204,13 @@ class M365Config:
 
 
 class M365Provider(CollaborationProvider):
-    """Microsoft 365 collaboration provider using Microsoft Graph API."""
+    """Microsoft 365 collaboration provider using Microsoft Graph API.
+
+    Use as ``async with M365Provider() as provider:`` to renew the access
+    token in the background. Outside the context manager (e.g. when created
+    via collab-core's registry) the token is renewed inline on the first
+    request after it nears expiry, and callers should ``await aclose()``.
+    """
 
     def __init__(self, config: dict | None = None):
         """Initialize the M365 provider.
@@ -90,47 +225,228 @@ class M365Provider(CollaborationProvider):
             client_secret=self._config.client_secret,
         )
         self._client = GraphServiceClient(credentials=self._credential)
+        self._http: httpx.AsyncClient | None = None
+        self._access_token: str | None = None
+        self._token_expiry: float = 0.0
+        self._token_task: asyncio.Task | None = None
+        self._token_lock = asyncio.Lock()
+        self._cache = TTLCache(CACHE_TTL)
+        self._default_site_id: str | None = None
+        self._expand_channels = True  # Cleared if the tenant rejects $expand
+
+    async def __aenter__(self) -> "M365Provider":
+        """Start keeping the access token warm in the background."""
+        if self._token_task is None:
+            self._token_task = asyncio.create_task(self._token_refresher())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Stop the token refresher and close the shared HTTP client."""
+        if self._token_task is not None:
+            self._token_task.cancel()
+            try:
+                await self._token_task
+            except asyncio.CancelledError:
+                pass
+            self._token_task = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
 
     @property
     def name(self) -> str:
         return "m365"
 
+    def invalidate(self, entity: str | None = None) -> None:
+        """Drop cached lookups after a write.
+
+        Args:
+            entity: "users", "channels" or "sites"; None clears everything.
+        """
+        self._cache.invalidate(entity)
+        if entity in (None, "sites"):
+            self._default_site_id = None
+
+    # =========================================================================
+    # Graph HTTP helpers
+    # =========================================================================
+
+    async def _get_http(self) -> httpx.AsyncClient:
+        """Get the shared HTTP client, creating it on first use."""
+        if self._http is None:
+            transport = httpx.AsyncHTTPTransport(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=MAX_CONCURRENT_REQUESTS,
+                    max_keepalive_connections=32,
+                ),
+            )
+            self._http = httpx.AsyncClient(
+                transport=RetryTransport(transport),
+                timeout=30,
+            )
+        return self._http
+
+    async def _refresh_token(self) -> None:
+        """Acquire a Graph access token and store it for direct requests."""
+        token = await asyncio.to_thread(self._credential.get_token, GRAPH_SCOPE)
+        self._access_token = token.token
+        self._token_expiry = token.expires_on
+
+    def _token_is_stale(self) -> bool:
+        return (
+            self._access_token is None
+            or time.time() >= self._token_expiry - TOKEN_EXPIRY_MARGIN
+        )
+
+    async def _token_refresher(self) -> None:
+        """Keep the access token warm by renewing it before it expires.
+
+        Runs while the provider is used as an async context manager.
+        """
+        while True:
+            refresh_at = self._token_expiry - TOKEN_EXPIRY_MARGIN
+            await asyncio.sleep(max(refresh_at - time.time(), 0))
+            previous_expiry = self._token_expiry
+            try:
+                async with self._token_lock:
+                    await self._refresh_token()
+            except Exception:
+                pass  # Request paths still refresh inline if the token goes stale
+            if self._token_expiry <= previous_expiry:
+                # Failed, or the credential handed back its cached token
+                await asyncio.sleep(TOKEN_RETRY_DELAY)
+
+    async def _auth_headers(self) -> dict[str, str]:
+        """Build the bearer auth header for direct Graph requests."""
+        if self._token_is_stale():
+            async with self._token_lock:
+                # Another caller may have refreshed while we waited
+                if self._token_is_stale():
+                    await self._refresh_token()
+        return {"Authorization": f"Bearer {self._access_token}"}
+
+    async def _graph_get(self, path: str, params: dict | None = None) -> dict:
+        """GET a Graph resource and return the decoded JSON body.
+
+        Args:
+            path: Resource path relative to the v1.0 endpoint, e.g. "/users",
+                or an absolute URL such as an ``@odata.nextLink``.
+            params: Optional OData query parameters.
+        """
+        url = path if path.startswith("https://") else f"{GRAPH_BASE_URL}{path}"
+        client = await self._get_http()
+        response = await client.get(
+            url,
+            params=params,
+            headers=await self._auth_headers(),
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)
+
+    async def _graph_batch(self, requests: list[dict]) -> list[dict]:
+        """Send requests through Graph JSON batching.
+
+        Requests are split into chunks of GRAPH_BATCH_LIMIT, one $batch POST
+        per chunk. Sub-requests throttled with 429/503 are resent after their
+        Retry-After delay. Responses are correlated by id and returned in the
+        same order as ``requests``; a request with no response maps to ``{}``.
+        """
+        client = await self._get_http()
+        responses_by_id: dict[str, dict] = {}
+        pending = requests
+        delay = 0.0
+        for attempt in range(MAX_RETRIES + 1):
+            if not pending:
+                break
+            if attempt:
+                await asyncio.sleep(delay)
+
+            headers = {**await self._auth_headers(), **JSON_HEADERS}
+            batches = await asyncio.gather(
+                *(
+                    client.post(
+                        f"{GRAPH_BASE_URL}/$batch",
+                        content=orjson.dumps(
+                            {"requests": pending[i : i + GRAPH_BATCH_LIMIT]}
+                        ),
+                        headers=headers,
+                    )
+                    for i in range(0, len(pending), GRAPH_BATCH_LIMIT)
+                )
+            )
+
+            throttled: set[str] = set()
+            delay = 0.0
+            for batch in batches:
+                batch.raise_for_status()
+                for response in orjson.loads(batch.content).get("responses", []):
+                    responses_by_id[response["id"]] = response
+                    if response.get("status") in RETRY_STATUSES:
+                        throttled.add(response["id"])
+                        retry_headers = httpx.Headers(response.get("headers") or {})
+                        delay = max(delay, _retry_delay(retry_headers, attempt))
+            pending = [req for req in pending if req["id"] in throttled]
+
+        return [responses_by_id.get(req["id"], {}) for req in requests]
+
     # =========================================================================
     # Users & Directory
     # =========================================================================
 
     async def list_users(self, limit: int = 25) -> list[User]:
         """List users in the tenant."""
-        query_params = UsersRequestBuilder.UsersRequestBuilderGetQueryParameters(
-            top=limit,
-            select=["id", "displayName", "userPrincipalName", "mail", "department"],
-        )
-        request_config = UsersRequestBuilder.UsersRequestBuilderGetRequestConfiguration(
-            query_parameters=query_params,
+        cache_key = ("users", "list", limit)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+        data = await self._graph_get(
+            "/users",
+            {
+                "$top": limit,
+                "$select": USER_SELECT,
+            },
         )
-        result = await self._client.users.get(request_configuration=request_config)
 
-        return [
+        users = [
             User(
-                id=user.id or "",
-                display_name=user.display_name or "",
-                email=user.mail or user.user_principal_name,
-                department=user.department,
+                id=user.get("id") or "",
+                display_name=user.get("displayName") or "",
+                email=user.get("mail") or user.get("userPrincipalName"),
+                department=user.get("department"),
             )
-            for user in (result.value or [])
+            for user in data.get("value", ())
         ]
+        self._cache.set(cache_key, users)
+        return list(users)
 
     async def get_user(self, user_id: str) -> User:
         """Get a specific user by ID or UPN."""
-        user = await self._client.users.by_user_id(user_id).get()
-        if not user:
-            raise ValueError(f"User not found: {user_id}")
-        return User(
-            id=user.id or "",
-            display_name=user.display_name or "",
-            email=user.mail or user.user_principal_name,
-            department=user.department,
+        cache_key = ("users", "id", user_id)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return replace(cached)
+
+        try:
+            user = await self._graph_get(
+                f"/users/{quote(user_id, safe='')}", {"$select": USER_SELECT}
+            )
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                raise ValueError(f"User not found: {user_id}") from e
+            raise
+        result = User(
+            id=user.get("id") or "",
+            display_name=user.get("displayName") or "",
+            email=user.get("mail") or user.get("userPrincipalName"),
+            department=user.get("department"),
         )
+        self._cache.set(cache_key, result)
+        return replace(result)
 
     # =========================================================================
     # Channels & Messaging
@@ -138,53 +454,129 @@ class M365Provider(CollaborationProvider):
 
     async def list_channels(self, team_id: str | None = None) -> list[Channel]:
         """List Teams channels."""
+        cache_key = ("channels", team_id)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+        channels, complete = await self._fetch_channels(team_id)
+        if complete:
+            # Don't pin a list missing teams that were throttled or erroring
+            self._cache.set(cache_key, channels)
+        return list(channels)
+
+    async def _fetch_channels(self, team_id: str | None) -> tuple[list[Channel], bool]:
+        """Fetch Teams channels from Graph, bypassing the cache.
+
+        Returns:
+            The channels, and whether the listing is complete (no team was
+            skipped because of throttling or a server error).
+        """
         if team_id:
             # List channels in a specific team
-            result = await self._client.teams.by_team_id(team_id).channels.get()
-            return [
+            data = await self._graph_get(
+                f"/teams/{quote(team_id, safe='')}/channels",
+                {"$select": CHANNEL_SELECT},
+            )
+            channels = [
                 Channel(
-                    id=ch.id or "",
-                    name=ch.display_name or "",
-                    description=ch.description,
+                    id=ch.get("id") or "",
+                    name=ch.get("displayName") or "",
+                    description=ch.get("description"),
                     team_id=team_id,
                 )
-                for ch in (result.value or [])
+                for ch in data.get("value", ())
             ]
-        else:
-            # List all teams first, then aggregate channels
-            query_params = GroupsRequestBuilder.GroupsRequestBuilderGetQueryParameters(
-                filter="resourceProvisioningOptions/Any(x:x eq 'Team')",
-                select=["id", "displayName"],
+            return channels, True
+
+        if self._expand_channels:
+            try:
+                return await self._fetch_channels_expanded(), True
+            except httpx.HTTPStatusError as e:
+                # 400/501: $expand unsupported. 403: some team is off-limits,
+                # which the batched path skips per team instead of failing.
+                if e.response.status_code not in (400, 403, 501):
+                    raise
+                self._expand_channels = False
+        return await self._fetch_channels_batched()
+
+    async def _fetch_channels_expanded(self) -> list[Channel]:
+        """List teams with their channels expanded inline, in one request."""
+        groups = await self._graph_get(
+            "/groups",
+            {
+                "$filter": TEAM_GROUPS_FILTER,
+                "$select": "id,displayName",
+                "$top": MAX_CHANNEL_TEAMS,
+                "$expand": f"team($expand=channels($select={CHANNEL_SELECT}))",
+            },
+        )
+        return [
+            Channel(
+                id=ch.get("id") or "",
+                name=ch.get("displayName") or "",
+                description=ch.get("description"),
+                team_id=group["id"],
+                team_name=group.get("displayName"),
             )
-            request_config = (
-                GroupsRequestBuilder.GroupsRequestBuilderGetRequestConfiguration(
-                    query_parameters=query_params,
+            for group in groups.get("value", ())[:MAX_CHANNEL_TEAMS]
+            if group.get("id")
+            for ch in (group.get("team") or {}).get("channels", ())
+        ]
+
+    async def _fetch_channels_batched(self) -> tuple[list[Channel], bool]:
+        """List teams, then fetch their channels in a single $batch.
+
+        Returns:
+            The channels, and whether every team was either listed or
+            permanently inaccessible (as opposed to throttled or failing).
+        """
+        teams = await self._graph_get(
+            "/groups",
+            {
+                "$filter": TEAM_GROUPS_FILTER,
+                "$select": "id,displayName",
+                "$top": MAX_CHANNEL_TEAMS,
+            },
+        )
+
+        team_list = [
+            team
+            for team in teams.get("value", ())[:MAX_CHANNEL_TEAMS]
+            if team.get("id")
+        ]
+        responses = await self._graph_batch(
+            [
+                {
+                    "id": str(i),
+                    "method": "GET",
+                    "url": f"/teams/{quote(team['id'], safe='')}/channels"
+                    f"?$select={CHANNEL_SELECT}",
+                }
+                for i, team in enumerate(team_list)
+            ]
+        )
+
+        all_channels: list[Channel] = []
+        complete = True
+        for team, response in zip(team_list, responses):
+            status = response.get("status")
+            if status != 200:
+                if status is None or status in RETRY_STATUSES or status >= 500:
+                    complete = False
+                continue  # Skip teams we can't access
+            for ch in response.get("body", {}).get("value", ()):
+                all_channels.append(
+                    Channel(
+                        id=ch.get("id") or "",
+                        name=ch.get("displayName") or "",
+                        description=ch.get("description"),
+                        team_id=team["id"],
+                        team_name=team.get("displayName"),
+                    )
                 )
-            )
-            teams = await self._client.groups.get(request_configuration=request_config)
-
-            all_channels: list[Channel] = []
-            for team in (teams.value or [])[:5]:  # Limit to first 5 teams
-                try:
-                    if not team.id:
-                        continue
-                    channels = await self._client.teams.by_team_id(
-                        team.id
-                    ).channels.get()
-                    for ch in channels.value or []:
-                        all_channels.append(
-                            Channel(
-                                id=ch.id or "",
-                                name=ch.display_name or "",
-                                description=ch.description,
-                                team_id=team.id,
-                                team_name=team.display_name,
-                            )
-                        )
-                except Exception:
-                    continue  # Skip teams we can't access
 
-            return all_channels
+        return all_channels, complete
 
     async def get_messages(
         self,
@@ -196,31 +588,76 @@ class M365Provider(CollaborationProvider):
         if not team_id:
             raise ValueError("team_id is required for M365 channel messages")
 
-        result = (
-            await self._client.teams.by_team_id(team_id)
-            .channels.by_channel_id(channel_id)
-            .messages.get()
+        # Ask the server for exactly `limit` messages, paging past its cap
+        raw: list[dict] = []
+        next_link: str | None = (
+            f"/teams/{quote(team_id, safe='')}"
+            f"/channels/{quote(channel_id, safe='')}/messages"
         )
+        params: dict | None = {"$top": min(limit, MESSAGES_PAGE_LIMIT)}
+        while next_link and len(raw) < limit:
+            data = await self._graph_get(next_link, params)
+            raw.extend(data.get("value", ()))
+            next_link = data.get("@odata.nextLink")
+            params = None  # nextLink already carries the query
 
-        messages: list[Message] = []
-        for msg in (result.value or [])[:limit]:
-            sender = "Unknown"
-            if msg.from_ and msg.from_.user:
-                sender = msg.from_.user.display_name or "Unknown"
-
-            messages.append(
-                Message(
-                    id=msg.id or "",
-                    content=msg.body.content if msg.body else "",
-                    sender=sender,
-                    timestamp=str(msg.created_date_time)
-                    if msg.created_date_time
-                    else "",
-                    channel_id=channel_id,
-                )
+        raw = raw[:limit]
+        senders = [(msg.get("from") or {}).get("user") or {} for msg in raw]
+
+        # Resolve each distinct sender once; only ids Graph sent without a
+        # display name need a lookup
+        names: dict[str, str] = {}
+        for user in senders:
+            if (user_id := user.get("id")) and (name := user.get("displayName")):
+                names[user_id] = name
+        unnamed = {user["id"] for user in senders if user.get("id")} - names.keys()
+        names.update(await self._resolve_display_names(unnamed))
+
+        return [
+            Message(
+                id=msg.get("id") or "",
+                content=(msg.get("body") or {}).get("content") or "",
+                sender=names.get(user.get("id"), "Unknown"),
+                timestamp=msg.get("createdDateTime") or "",
+                channel_id=channel_id,
             )
+            for msg, user in zip(raw, senders)
+        ]
+
+    async def _resolve_display_names(self, user_ids: set[str]) -> dict[str, str]:
+        """Map user IDs to display names via the cache and filtered lookups."""
+        names: dict[str, str] = {}
+        missing: list[str] = []
+        for user_id in user_ids:
+            cached = self._cache.get(("users", "name", user_id))
+            if cached is not None:
+                names[user_id] = cached
+            else:
+                missing.append(user_id)
 
-        return messages
+        pages = await asyncio.gather(
+            *(
+                self._graph_get(
+                    "/users",
+                    {
+                        "$filter": "id in ({})".format(
+                            ",".join(
+                                f"'{user_id}'"
+                                for user_id in missing[i : i + USER_FILTER_LIMIT]
+                            )
+                        ),
+                        "$select": "id,displayName",
+                    },
+                )
+                for i in range(0, len(missing), USER_FILTER_LIMIT)
+            )
+        )
+        for page in pages:
+            for user in page.get("value", ()):
+                if (user_id := user.get("id")) and (name := user.get("displayName")):
+                    names[user_id] = name
+                    self._cache.set(("users", "name", user_id), name)
+        return names
 
     async def post_message(
         self,
@@ -247,69 +684,103 @@ class M365Provider(CollaborationProvider):
         else:
             payload = {"text": message}
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(webhook_url, json=payload)
-            return response.status_code == 200
+        client = await self._get_http()
+        response = await client.post(
+            webhook_url, content=orjson.dumps(payload), headers=JSON_HEADERS
+        )
+        return response.status_code == 200
 
     # =========================================================================
     # Documents & Files (SharePoint)
     # =========================================================================
 
+    async def _resolve_site_id(self, site_id: str | None) -> str:
+        """Return site_id, falling back to the tenant's first SharePoint site.
+
+        The default site is looked up once and then reused.
+        """
+        if site_id:
+            return site_id
+        if self._default_site_id:
+            return self._default_site_id
+
+        sites = await self._client.sites.get()
+        if not sites or not sites.value:
+            raise ValueError("No SharePoint sites available")
+        first_site = sites.value[0]
+        if not first_site.id:
+            raise ValueError("Default SharePoint site has no ID")
+        self._default_site_id = first_site.id
+        return first_site.id
+
     async def list_documents(
         self,
         folder_path: str | None = None,
         site_id: str | None = None,
     ) -> list[Document]:
         """List documents in SharePoint."""
-        if not site_id:
-            # Get default site
-            sites = await self._client.sites.get()
-            if not sites or not sites.value:
-                return []
-            first_site = sites.value[0]
-            if not first_site.id:
-                return []
-            site_id = first_site.id
+        site_id = await self._resolve_site_id(site_id)
 
+        drive = f"/sites/{quote(site_id, safe='')}/drive"
         if folder_path and folder_path != "root":
-            result = (
-                await self._client.sites.by_site_id(site_id)
-                .drive.root.item_with_path(folder_path)
-                .children.get()
-            )
+            path = f"{drive}/root:/{quote(folder_path)}:/children"
         else:
-            result = await self._client.sites.by_site_id(
-                site_id
-            ).drive.root.children.get()
+            path = f"{drive}/root/children"
+        data = await self._graph_get(path, {"$select": DRIVE_ITEM_SELECT})
 
+        document_path = folder_path or "/"
         return [
             Document(
-                id=item.id or "",
-                name=item.name or "",
-                path=folder_path or "/",
-                web_url=item.web_url,
-                size=item.size,
-                is_folder=item.folder is not None,
+                id=item.get("id") or "",
+                name=item.get("name") or "",
+                path=document_path,
+                web_url=item.get("webUrl"),
+                size=item.get("size"),
+                is_folder="folder" in item,
             )
-            for item in (result.value or [])
+            for item in data.get("value", ())
         ]
 
+    async def list_documents_many(
+        self,
+        folder_paths: list[str],
+        site_id: str | None = None,
+    ) -> dict[str, list[Document]]:
+        """List documents in several SharePoint folders concurrently.
+
+        Returns:
+            Documents keyed by folder path.
+        """
+        site_id = await self._resolve_site_id(site_id)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+        async def list_one(folder_path: str) -> list[Document]:
+            async with semaphore:
+                return await self.list_documents(folder_path, site_id)
+
+        results = await asyncio.gather(*(list_one(p) for p in folder_paths))
+        return dict(zip(folder_paths, results))
+
     async def upload_document(
         self,
         name: str,
-        content: bytes | str,
+        content: bytes | str | AsyncIterator[bytes],
         folder_path: str | None = None,
         site_id: str | None = None,
+        size: int | None = None,
     ) -> Document:
-        """Upload a document to SharePoint."""
-        if not site_id:
-            sites = await self._client.sites.get()
-            if not sites or not sites.value:
-                raise ValueError("No SharePoint sites available")
-            first_site = sites.value[0]
-            if not first_site.id:
-                raise ValueError("SharePoint site has no ID")
-            site_id = first_site.id
+        """Upload a document to SharePoint.
+
+        Content larger than 4 MiB is sent through a resumable upload session
+        in 10 MiB slices. An async iterator is consumed incrementally and is
+        never fully buffered.
+
+        Args:
+            size: Total byte size of an async iterator ``content``. Required
+                for streams larger than 4 MiB, since every upload session
+                slice must declare the total.
+        """
+        site_id = await self._resolve_site_id(site_id)
 
         if isinstance(content, str):
             content = content.encode("utf-8")
@@ -318,18 +789,96 @@ class M365Provider(CollaborationProvider):
             f"{folder_path}/{name}" if folder_path and folder_path != "root" else name
         )
 
-        result = (
-            await self._client.sites.by_site_id(site_id)
-            .drive.root.item_with_path(path)
-            .content.put(content)
-        )
+        if isinstance(content, bytes):
+            total = len(content)
+            slices = _slice_bytes(content, UPLOAD_CHUNK_SIZE)
+        elif size is not None and size > SIMPLE_UPLOAD_LIMIT:
+            total = size
+            slices = _rechunk(content, UPLOAD_CHUNK_SIZE)
+        else:
+            # Small (or unsized) stream: read at most one byte past the limit
+            buffer = bytearray()
+            async for piece in content:
+                buffer += piece
+                if len(buffer) > SIMPLE_UPLOAD_LIMIT:
+                    raise ValueError(
+                        "size is required to upload streams larger than 4 MiB"
+                    )
+            content = bytes(buffer)
+            total = len(content)
+
+        if total <= SIMPLE_UPLOAD_LIMIT:
+            result = (
+                await self._client.sites.by_site_id(site_id)
+                .drive.root.item_with_path(path)
+                .content.put(content)
+            )
+            return Document(
+                id=result.id if result else "",
+                name=name,
+                path=path,
+                web_url=result.web_url if result else None,
+            )
 
+        item = await self._upload_session(site_id, path, slices, total)
         return Document(
-            id=result.id if result else "",
+            id=item.get("id") or "",
             name=name,
             path=path,
-            web_url=result.web_url if result else None,
+            web_url=item.get("webUrl"),
+            size=item.get("size"),
+        )
+
+    async def _upload_session(
+        self,
+        site_id: str,
+        path: str,
+        slices: AsyncIterator[bytes],
+        total: int,
+    ) -> dict:
+        """Upload slices through a Graph resumable upload session.
+
+        Args:
+            site_id: SharePoint site ID.
+            path: Destination path relative to the drive root.
+            slices: Byte slices, each a multiple of 320 KiB except the last.
+            total: Total upload size in bytes.
+
+        Returns:
+            The created drive item as JSON.
+        """
+        client = await self._get_http()
+        drive = f"{GRAPH_BASE_URL}/sites/{quote(site_id, safe='')}/drive"
+        response = await client.post(
+            f"{drive}/root:/{quote(path)}:/createUploadSession",
+            json={"item": {"@microsoft.graph.conflictBehavior": "replace"}},
+            headers=await self._auth_headers(),
         )
+        response.raise_for_status()
+        upload_url = response.json()["uploadUrl"]
+
+        try:
+            offset = 0
+            async for data in slices:
+                if offset + len(data) > total:
+                    raise ValueError("Upload stream is longer than its declared size")
+                # The upload URL is pre-authenticated; it must not get a bearer token
+                response = await client.put(
+                    upload_url,
+                    content=data,
+                    headers={"Content-Range": _content_range(offset, len(data), total)},
+                )
+                response.raise_for_status()
+                offset += len(data)
+            if offset != total:
+                raise ValueError("Upload stream is shorter than its declared size")
+        except Exception:
+            try:
+                await client.delete(upload_url)
+            except httpx.HTTPError:
+                pass  # Keep the original error; the session expires on its own
+            raise
+        return response.json()
 
     async def download_document(
         self,
@@ -337,21 +886,37 @@ class M365Provider(CollaborationProvider):
         site_id: str | None = None,
     ) -> bytes:
         """Download a document from SharePoint."""
-        if not site_id:
-            sites = await self._client.sites.get()
-            if not sites or not sites.value:
-                raise ValueError("No SharePoint sites available")
-            first_site = sites.value[0]
-            if not first_site.id:
-                raise ValueError("SharePoint site has no ID")
-            site_id = first_site.id
-
-        content = (
-            await self._client.sites.by_site_id(site_id)
-            .drive.items.by_drive_item_id(document_id)
-            .content.get()
+        content = bytearray()
+        async for chunk in self.download_document_stream(document_id, site_id):
+            content += chunk
+        return bytes(content)
+
+    async def download_document_stream(
+        self,
+        document_id: str,
+        site_id: str | None = None,
+    ) -> AsyncIterator[bytes]:
+        """Stream a document from SharePoint in 64 KiB chunks.
+
+        The file is never held in memory as a whole.
+        """
+        site_id = await self._resolve_site_id(site_id)
+
+        item = await self._graph_get(
+            f"/sites/{quote(site_id, safe='')}"
+            f"/drive/items/{quote(document_id, safe='')}",
+            {"$select": "id,@microsoft.graph.downloadUrl"},
         )
-        return content or b""
+        download_url = item.get("@microsoft.graph.downloadUrl")
+        if not download_url:
+            raise ValueError(f"Document has no downloadable content: {document_id}")
+
+        # The download URL is pre-authenticated; it must not get a bearer token
+        client = await self._get_http()
+        async with client.stream("GET", download_url) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                yield chunk
 
     # =========================================================================
     # Tasks & Planning (Planner)
@@ -363,24 +928,44 @@ class M365Provider(CollaborationProvider):
             # Would need to get plans first
             return []
 
-        result = await self._client.planner.plans.by_planner_plan_id(
-            plan_id
-        ).tasks.get()
+        data = await self._graph_get(f"/planner/plans/{quote(plan_id, safe='')}/tasks")
 
         return [
             Task(
-                id=task.id or "",
-                title=task.title or "",
-                status="complete" if task.percent_complete == 100 else "in_progress",
-                due_date=str(task.due_date_time) if task.due_date_time else None,
+                id=task.get("id") or "",
+                title=task.get("title") or "",
+                status=(
+                    "complete" if task.get("percentComplete") == 100 else "in_progress"
+                ),
+                due_date=task.get("dueDateTime"),
             )
-            for task in (result.value or [])
+            for task in data.get("value", ())
         ]
 
     # =========================================================================
     # Email (Outlook)
     # =========================================================================
 
+    async def _resolve_sender_id(self, from_user: str | None) -> str:
+        """Return from_user, falling back to the first user in the tenant.
+
+        The default sender is cached so repeat sends skip the user lookup.
+        """
+        if from_user:
+            return from_user
+
+        cache_key = ("users", "default_sender")
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Use first available user (admin typically)
+        users = await self.list_users(limit=1)
+        if not users or not users[0].id:
+            raise ValueError("No users available to send email from")
+        self._cache.set(cache_key, users[0].id)
+        return users[0].id
+
     async def send_email(
         self,
         to: list[str],
@@ -388,25 +973,60 @@ class M365Provider(CollaborationProvider):
         body: str,
         from_user: str | None = None,
     ) -> bool:
-        """Send an email via Outlook."""
-        if not from_user:
-            # Use first available user (admin typically)
-            users = await self.list_users(limit=1)
-            if not users:
-                raise ValueError("No users available to send email from")
-            from_user = users[0].id
-
-        message = OutlookMessage(
-            subject=subject,
-            body=ItemBody(
-                content_type=BodyType.Text,
-                content=body,
-            ),
-            to_recipients=[
-                Recipient(email_address=EmailAddress(address=addr)) for addr in to
-            ],
-        )
+        """Send an email via Outlook.
 
-        request_body = SendMailPostRequestBody(message=message, save_to_sent_items=True)
-        await self._client.users.by_user_id(from_user).send_mail.post(request_body)
+        Recipients are split into groups of MAIL_RECIPIENT_CHUNK, each sent as
+        its own message; all groups go out through $batch in parallel.
+
+        Returns:
+            True once every message has been accepted.
+
+        Raises:
+            RuntimeError: If any group was rejected. The message names the
+                failing recipient groups with Graph's status and error; the
+                other groups have already been sent.
+        """
+        if not to:
+            raise ValueError("At least one recipient is required")
+        from_user = await self._resolve_sender_id(from_user)
+
+        requests = [
+            {
+                "id": str(i),
+                "method": "POST",
+                "url": f"/users/{quote(from_user, safe='')}/sendMail",
+                "headers": JSON_HEADERS,
+                "body": {
+                    "message": {
+                        "subject": subject,
+                        "body": {"contentType": "Text", "content": body},
+                        "toRecipients": [
+                            {"emailAddress": {"address": addr}}
+                            for addr in to[start : start + MAIL_RECIPIENT_CHUNK]
+                        ],
+                    },
+                    "saveToSentItems": True,
+                },
+            }
+            for i, start in enumerate(range(0, len(to), MAIL_RECIPIENT_CHUNK))
+        ]
+        responses = await self._graph_batch(requests)
+
+        failures = []
+        for i, response in enumerate(responses):
+            if response.get("status") == 202:
+                continue
+            start = i * MAIL_RECIPIENT_CHUNK
+            group = to[start : start + MAIL_RECIPIENT_CHUNK]
+            error = (response.get("body") or {}).get("error") or {}
+            failures.append(
+                f"recipients {start + 1}-{start + len(group)} "
+                f"({group[0]}..{group[-1]}): {response.get('status')} "
+                f"{error.get('code', '')} {error.get('message', '')}".rstrip()
+            )
+        if failures:
+            raise RuntimeError(
+                f"sendMail failed for {len(failures)} of {len(requests)} recipient "
+                f"group(s); the rest were sent. " + "; ".join(failures)
+            )
         return True
@@ -0,0 +1,615 @@
+"""Tests for the M365 provider's HTTP helpers."""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import orjson
+import pytest
+
+from amplifier_module_tool_m365.providers import m365
+from amplifier_module_tool_m365.providers.m365 import (
+    MAX_RETRY_DELAY,
+    M365Provider,
+    RetryTransport,
+)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record asyncio.sleep delays instead of waiting."""
+    delays: list[float] = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(m365.asyncio, "sleep", fake_sleep)
+    return delays
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """Provider with a fresh token so no credential call is made."""
+    monkeypatch.setenv("M365_TENANT_ID", "tenant")
+    monkeypatch.setenv("M365_CLIENT_ID", "client")
+    monkeypatch.setenv("M365_CLIENT_SECRET", "secret")
+    monkeypatch.delenv("M365_TEAMS_WEBHOOKS", raising=False)
+    provider = M365Provider()
+    provider._access_token = "token"
+    provider._token_expiry = time.time() + 3600
+    return provider
+
+
+def mock_client(handler) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+# =============================================================================
+# Throttling retries
+# =============================================================================
+
+
+@pytest.mark.asyncio
+async def test_retry_transport_honors_retry_after(sleeps):
+    statuses = iter([429, 503, 200])
+
+    def handler(request):
+        return httpx.Response(next(statuses), headers={"Retry-After": "2"})
+
+    async with httpx.AsyncClient(
+        transport=RetryTransport(httpx.MockTransport(handler))
+    ) as client:
+        response = await client.get("https://graph.microsoft.com/v1.0/users")
+
+    assert response.status_code == 200
+    assert sleeps == [2.0, 2.0]
+
+
+@pytest.mark.asyncio
+async def test_retry_transport_backs_off_and_gives_up(sleeps):
+    calls = 0
+
+    def handler(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(429)
+
+    async with httpx.AsyncClient(
+        transport=RetryTransport(httpx.MockTransport(handler), max_retries=3)
+    ) as client:
+        response = await client.get("https://graph.microsoft.com/v1.0/users")
+
+    assert response.status_code == 429
+    assert calls == 4
+    assert sleeps == [1.0, 2.0, 4.0]
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [("3600", MAX_RETRY_DELAY), ("-5", 0.0), ("nan", 1.0), ("soon", 1.0)],
+)
+def test_retry_delay_is_clamped(value, expected):
+    assert m365._retry_delay({"Retry-After": value}, attempt=0) == expected
+
+
+@pytest.mark.asyncio
+async def test_graph_batch_resends_throttled_sub_requests(provider, sleeps):
+    sent: list[list[str]] = []
+
+    def handler(request):
+        ids = [req["id"] for req in orjson.loads(request.content)["requests"]]
+        sent.append(ids)
+        throttle_first = len(sent) == 1
+        return httpx.Response(
+            200,
+            json={
+                "responses": [
+                    (
+                        {"id": i, "status": 429, "headers": {"retry-after": "7"}}
+                        if throttle_first and i == "1"
+                        else {"id": i, "status": 200, "body": {"value": [i]}}
+                    )
+                    for i in ids
+                ]
+            },
+        )
+
+    provider._http = mock_client(handler)
+    requests = [{"id": str(i), "method": "GET", "url": f"/x/{i}"} for i in range(3)]
+    responses = await provider._graph_batch(requests)
+
+    assert sent == [["0", "1", "2"], ["1"]]
+    assert sleeps == [7.0]
+    assert [r["body"]["value"] for r in responses] == [["0"], ["1"], ["2"]]
+
+
+@pytest.mark.asyncio
+async def test_graph_batch_splits_into_chunks_of_twenty(provider):
+    chunk_sizes: list[int] = []
+
+    def handler(request):
+        batch = orjson.loads(request.content)["requests"]
+        chunk_sizes.append(len(batch))
+        return httpx.Response(
+            200,
+            json={"responses": [{"id": r["id"], "status": 200} for r in batch]},
+        )
+
+    provider._http = mock_client(handler)
+    requests = [{"id": str(i), "method": "GET", "url": "/x"} for i in range(45)]
+    responses = await provider._graph_batch(requests)
+
+    assert sorted(chunk_sizes) == [5, 20, 20]
+    assert [r["id"] for r in responses] == [str(i) for i in range(45)]
+
+
+# =============================================================================
+# Upload sessions
+# =============================================================================
+
+
+async def collect(chunks) -> list[bytes]:
+    return [chunk async for chunk in chunks]
+
+
+async def pieces(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+def test_content_range():
+    assert m365._content_range(0, 10, 25) == "bytes 0-9/25"
+    assert m365._content_range(20, 5, 25) == "bytes 20-24/25"
+
+
+@pytest.mark.asyncio
+async def test_slice_bytes():
+    assert await collect(m365._slice_bytes(b"abcdefg", 3)) == [b"abc", b"def", b"g"]
+
+
+@pytest.mark.asyncio
+async def test_rechunk_regroups_uneven_pieces():
+    chunks = m365._rechunk(pieces(b"ab", b"cdefg", b"", b"hij"), 4)
+    assert await collect(chunks) == [b"abcd", b"efgh", b"ij"]
+
+
+def upload_handler(log: list[tuple[str, str | None]]):
+    def handler(request):
+        log.append((request.method, request.headers.get("Content-Range")))
+        if request.url.path.endswith("/createUploadSession"):
+            return httpx.Response(200, json={"uploadUrl": "https://upload.test/s"})
+        if request.method == "DELETE":
+            return httpx.Response(204)
+        end, total = request.headers["Content-Range"].split("-")[1].split("/")
+        if int(end) + 1 < int(total):
+            return httpx.Response(202, json={})
+        return httpx.Response(201, json={"id": "item", "size": int(total)})
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_upload_session_sends_content_ranges(provider):
+    log: list[tuple[str, str | None]] = []
+    provider._http = mock_client(upload_handler(log))
+
+    item = await provider._upload_session(
+        "site", "a/b.txt", m365._slice_bytes(b"x" * 25, 10), 25
+    )
+
+    assert item == {"id": "item", "size": 25}
+    assert log == [
+        ("POST", None),
+        ("PUT", "bytes 0-9/25"),
+        ("PUT", "bytes 10-19/25"),
+        ("PUT", "bytes 20-24/25"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_upload_session_quotes_path(provider):
+    paths: list[str] = []
+
+    def handler(request):
+        paths.append(request.url.raw_path.decode())
+        return upload_handler([])(request)
+
+    provider._http = mock_client(handler)
+    await provider._upload_session("site", "Q1#drafts/a?.txt", pieces(b"x"), 1)
+
+    assert paths[0] == (
+        "/v1.0/sites/site/drive/root:/Q1%23drafts/a%3F.txt:/createUploadSession"
+    )
+
+
+@pytest.mark.asyncio
+async def test_upload_session_rejects_size_mismatch_and_cancels(provider):
+    log: list[tuple[str, str | None]] = []
+    provider._http = mock_client(upload_handler(log))
+
+    with pytest.raises(ValueError, match="shorter"):
+        await provider._upload_session("site", "f", pieces(b"x" * 10), 25)
+
+    assert log[-1] == ("DELETE", None)
+
+
+@pytest.mark.asyncio
+async def test_upload_session_cleanup_failure_keeps_original_error(provider):
+    def handler(request):
+        if request.method == "DELETE":
+            raise httpx.ConnectError("gone")
+        if request.method == "PUT":
+            return httpx.Response(400)
+        return upload_handler([])(request)
+
+    provider._http = mock_client(handler)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await provider._upload_session("site", "f", pieces(b"x"), 1)
+
+
+@pytest.mark.asyncio
+async def test_upload_document_requires_size_for_large_streams(provider):
+    provider._default_site_id = "site"
+    chunk = b"x" * (1024 * 1024)
+
+    with pytest.raises(ValueError, match="size is required"):
+        await provider.upload_document("big.bin", pieces(*[chunk] * 5))
+
+
+# =============================================================================
+# Channels
+# =============================================================================
+
+
+@pytest.mark.asyncio
+async def test_list_channels_falls_back_when_expand_is_forbidden(provider):
+    tops: list[str | None] = []
+
+    def handler(request):
+        if request.url.path.endswith("/groups"):
+            tops.append(request.url.params.get("$top"))
+        if "$expand" in request.url.params:
+            return httpx.Response(403)
+        if request.url.path.endswith("/groups"):
+            return httpx.Response(200, json={"value": [{"id": "t1"}, {"id": "t2"}]})
+        return httpx.Response(
+            200,
+            json={
+                "responses": [
+                    {"id": "0", "status": 200, "body": {"value": [{"id": "c1"}]}},
+                    {"id": "1", "status": 403},
+                ]
+            },
+        )
+
+    provider._http = mock_client(handler)
+    channels = await provider.list_channels()
+
+    assert [(c.id, c.team_id) for c in channels] == [("c1", "t1")]
+    assert provider._expand_channels is False
+    # Both paths only ask Graph for the teams they will actually scan
+    assert tops == [str(m365.MAX_CHANNEL_TEAMS)] * 2
+    assert provider._cache.get(("channels", None)) is not None
+
+
+@pytest.mark.asyncio
+async def test_list_channels_does_not_cache_throttled_teams(provider, sleeps):
+    provider._expand_channels = False
+
+    def handler(request):
+        if request.url.path.endswith("/groups"):
+            return httpx.Response(200, json={"value": [{"id": "t1"}]})
+        return httpx.Response(200, json={"responses": [{"id": "0", "status": 429}]})
+
+    provider._http = mock_client(handler)
+    assert await provider.list_channels() == []
+    assert provider._cache.get(("channels", None)) is None
+
+
+# =============================================================================
+# Email
+# =============================================================================
+
+
+@pytest.mark.asyncio
+async def test_send_email_chunks_recipients_and_reports_failures(provider):
+    batches: list[list[dict]] = []
+
+    def handler(request):
+        batch = orjson.loads(request.content)["requests"]
+        batches.append(batch)
+        return httpx.Response(
+            200,
+            json={
+                "responses": [
+                    (
+                        {
+                            "id": r["id"],
+                            "status": 403,
+                            "body": {
+                                "error": {
+                                    "code": "ErrorAccessDenied",
+                                    "message": "Access is denied.",
+                                }
+                            },
+                        }
+                        if r["id"] == "1"
+                        else {"id": r["id"], "status": 202}
+                    )
+                    for r in batch
+                ]
+            },
+        )
+
+    provider._http = mock_client(handler)
+    to = [f"user{i}@example.com" for i in range(120)]
+
+    with pytest.raises(RuntimeError) as excinfo:
+        await provider.send_email(to, "Hi", "Body", from_user="sender")
+
+    requests = batches[0]
+    assert [len(r["body"]["message"]["toRecipients"]) for r in requests] == [
+        50,
+        50,
+        20,
+    ]
+    message = str(excinfo.value)
+    assert "1 of 3" in message
+    assert "recipients 51-100 (user50@example.com..user99@example.com)" in message
+    assert "403 ErrorAccessDenied Access is denied." in message
+
+
+# =============================================================================
+# Path encoding
+# =============================================================================
+
+
+@pytest.mark.asyncio
+async def test_get_user_encodes_guest_upn(provider):
+    paths: list[str] = []
+
+    def handler(request):
+        paths.append(request.url.raw_path.decode())
+        return httpx.Response(200, json={"id": "u1", "displayName": "Guest"})
+
+    provider._http = mock_client(handler)
+    user = await provider.get_user("john_gmail.com#EXT#@contoso.onmicrosoft.com")
+
+    assert user.display_name == "Guest"
+    assert paths[0].startswith(
+        "/v1.0/users/john_gmail.com%23EXT%23%40contoso.onmicrosoft.com?"
+    )
+
+
+@pytest.mark.asyncio
+async def test_graph_ids_are_encoded_in_paths_and_batch_urls(provider):
+    paths: list[str] = []
+    batch_urls: list[str] = []
+
+    def handler(request):
+        if request.url.path.endswith("/$batch"):
+            batch = orjson.loads(request.content)["requests"]
+            batch_urls.extend(r["url"] for r in batch)
+            return httpx.Response(
+                200, json={"responses": [{"id": r["id"], "status": 202} for r in batch]}
+            )
+        paths.append(request.url.raw_path.decode())
+        return httpx.Response(200, json={"value": []})
+
+    provider._http = mock_client(handler)
+    await provider.get_messages("19:abc@thread.tacv2", team_id="team/1")
+    await provider.list_tasks("plan#1")
+    await provider.send_email(["a@example.com"], "Hi", "Body", from_user="a#EXT#@b")
+
+    assert paths[0].startswith(
+        "/v1.0/teams/team%2F1/channels/19%3Aabc%40thread.tacv2/messages?"
+    )
+    assert paths[1] == "/v1.0/planner/plans/plan%231/tasks"
+    assert batch_urls == ["/users/a%23EXT%23%40b/sendMail"]
+
+
+# =============================================================================
+# Access token refresh
+# =============================================================================
+
+
+class FixedExpiryCredential:
+    """Credential that keeps handing back the same cached token."""
+
+    def __init__(self, expires_on: float):
+        self.expires_on = expires_on
+        self.calls = 0
+
+    def get_token(self, scope):
+        self.calls += 1
+        return SimpleNamespace(token="token", expires_on=self.expires_on)
+
+
+@pytest.mark.asyncio
+async def test_token_refresher_backs_off_when_expiry_does_not_move(
+    provider, monkeypatch
+):
+    # Still valid, but inside the renewal margin, so every wake-up refreshes
+    provider._token_expiry = time.time() + 60
+    credential = FixedExpiryCredential(provider._token_expiry)
+    provider._credential = credential
+
+    delays: list[float] = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+        if len(delays) == 6:
+            raise asyncio.CancelledError
+
+    monkeypatch.setattr(m365.asyncio, "sleep", fake_sleep)
+    with pytest.raises(asyncio.CancelledError):
+        await provider._token_refresher()
+
+    assert delays == [0, m365.TOKEN_RETRY_DELAY] * 3
+    assert credential.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_aclose_cancels_token_refresher(provider):
+    async with provider:
+        task = provider._token_task
+        assert task is not None and not task.done()
+
+    assert task.cancelled()
+    assert provider._token_task is None
+
+
+# =============================================================================
+# Caching
+# =============================================================================
+
+
+def test_ttl_cache_sweeps_expired_entries_on_write(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(m365.time, "monotonic", lambda: now)
+    cache = m365.TTLCache(ttl=10)
+    for i in range(100):
+        cache.set(("users", "id", str(i)), i)
+
+    now += 11
+    cache.set(("users", "id", "fresh"), "fresh")
+
+    assert list(cache._entries) == [("users", "id", "fresh")]
+
+
+@pytest.mark.asyncio
+async def test_get_user_returns_copies_of_cached_user(provider):
+    calls = 0
+
+    def handler(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(200, json={"id": "u1", "displayName": "Ada"})
+
+    provider._http = mock_client(handler)
+    first = await provider.get_user("u1")
+    first.display_name = "changed"
+    second = await provider.get_user("u1")
+
+    assert calls == 1
+    assert second.display_name == "Ada"
+
+
+# =============================================================================
+# Channel messages
+# =============================================================================
+
+
+def message(i: int, user_id: str | None, name: str | None = None) -> dict:
+    sender = {"user": {"id": user_id, "displayName": name}} if user_id else None
+    return {
+        "id": f"m{i}",
+        "body": {"content": f"hello {i}"},
+        "from": sender,
+        "createdDateTime": f"2026-01-01T00:00:{i:02d}Z",
+    }
+
+
+def filter_ids(request) -> list[str]:
+    """Ids from a /users "id in ('a','b')" filter."""
+    ids = request.url.params["$filter"].removeprefix("id in (").removesuffix(")")
+    return sorted(part.strip("'") for part in ids.split(","))
+
+
+@pytest.mark.asyncio
+async def test_get_messages_resolves_each_unnamed_sender_once(provider):
+    lookups: list[list[str]] = []
+    page = [
+        message(0, "u1", "Ada"),
+        message(1, "u2"),
+        message(2, "u1", "Ada"),
+        message(3, "u3"),
+        message(4, "u2"),
+        message(5, None),
+    ]
+
+    def handler(request):
+        if request.url.path == "/v1.0/users":
+            lookups.append(filter_ids(request))
+            return httpx.Response(
+                200,
+                json={
+                    "value": [
+                        {"id": "u2", "displayName": "Grace"},
+                        {"id": "u3", "displayName": "Linus"},
+                    ]
+                },
+            )
+        return httpx.Response(200, json={"value": page})
+
+    provider._http = mock_client(handler)
+    messages = await provider.get_messages("c1", team_id="t1")
+
+    assert lookups == [["u2", "u3"]]
+    assert [m.sender for m in messages] == [
+        "Ada",
+        "Grace",
+        "Ada",
+        "Linus",
+        "Grace",
+        "Unknown",
+    ]
+    assert messages[3].timestamp == "2026-01-01T00:00:03Z"
+
+    # Names are cached, so reading the channel again needs no lookup
+    await provider.get_messages("c1", team_id="t1")
+    assert lookups == [["u2", "u3"]]
+
+
+@pytest.mark.asyncio
+async def test_get_messages_chunks_sender_lookups(provider):
+    lookups: list[list[str]] = []
+    page = [message(i, f"u{i:02d}") for i in range(20)]
+
+    def handler(request):
+        if request.url.path == "/v1.0/users":
+            ids = filter_ids(request)
+            lookups.append(ids)
+            return httpx.Response(
+                200, json={"value": [{"id": i, "displayName": i.upper()} for i in ids]}
+            )
+        return httpx.Response(200, json={"value": page})
+
+    provider._http = mock_client(handler)
+    messages = await provider.get_messages("c1", team_id="t1")
+
+    assert sorted(len(ids) for ids in lookups) == [5, m365.USER_FILTER_LIMIT]
+    assert sorted(sum(lookups, [])) == [f"u{i:02d}" for i in range(20)]
+    assert messages[7].sender == "U07"
+
+
+@pytest.mark.asyncio
+async def test_get_messages_follows_next_link_and_trims_to_limit(provider):
+    requests: list[httpx.Request] = []
+    next_link = (
+        "https://graph.microsoft.com/v1.0/teams/t1/channels/c1/messages"
+        "?$top=50&$skiptoken=abc"
+    )
+
+    def handler(request):
+        requests.append(request)
+        if len(requests) == 1:
+            page = [message(i, "u1", "Ada") for i in range(50)]
+            return httpx.Response(
+                200, json={"value": page, "@odata.nextLink": next_link}
+            )
+        page = [message(i, "u1", "Ada") for i in range(50, 100)]
+        return httpx.Response(
+            200, json={"value": page, "@odata.nextLink": next_link + "2"}
+        )
+
+    provider._http = mock_client(handler)
+    messages = await provider.get_messages("c1", limit=60, team_id="t1")
+
+    assert len(requests) == 2
+    assert requests[0].url.params["$top"] == "50"
+    # The nextLink is followed as-is, without re-adding the first page's params
+    assert str(requests[1].url) == next_link
+    assert [m.id for m in messages] == [f"m{i}" for i in range(60)]